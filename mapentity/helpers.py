@@ -2,9 +2,11 @@ import json
 import logging
 import math
 import os
+import re
 import string
 import time
 from datetime import datetime
+from functools import lru_cache
 from mimetypes import types_map
 from urllib.parse import urljoin, quote
 
@@ -16,7 +18,7 @@ from django.contrib.gis.geos import GEOSException, fromstr
 from django.http import HttpResponse
 from django.template.exceptions import TemplateDoesNotExist
 from django.template.loader import get_template
-from django.urls import resolve
+from django.urls import resolve, reverse, get_script_prefix, get_urlconf
 from django.utils import timezone
 from django.utils.translation import get_language
 
@@ -64,20 +66,44 @@ def smart_urljoin(base, path):
     return urljoin(base, path)
 
 
+# Any value matching primary key URL patterns, and unlikely to appear elsewhere in URLs
+PK_PLACEHOLDER = '8675309123456789'
+PK_PATTERN = re.compile(r'[0-9]+')
+
+
+@lru_cache(maxsize=None)
+def _reverse_template(viewname, kwargs, urlconf, script_prefix, language):
+    return reverse(viewname, urlconf=urlconf, kwargs=dict(kwargs, pk=PK_PLACEHOLDER))
+
+
+def reverse_pk(viewname, pk, **kwargs):
+    """ Same as ``reverse(viewname, kwargs={'pk': pk, ...})``, except that the
+    URL resolvers are only walked once per view name.
+    """
+    pk = str(pk)
+    if not PK_PATTERN.fullmatch(pk):
+        # Not a valid value for the placeholder: let reverse() match it against the URL pattern
+        return reverse(viewname, kwargs=dict(kwargs, pk=pk))
+    template = _reverse_template(viewname, tuple(sorted(kwargs.items())),
+                                 get_urlconf(settings.ROOT_URLCONF), get_script_prefix(), get_language())
+    return template.replace(PK_PLACEHOLDER, pk)
+
+
 def is_file_uptodate(path, date_update, delete_empty=True):
-    if not os.path.exists(path):
+    if date_update is None:
         return False
 
-    if date_update is None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
         return False
 
-    if os.path.getsize(path) == 0:
+    if stat.st_size == 0:
         if delete_empty:
             os.remove(path)
         return False
 
-    modified = datetime.utcfromtimestamp(os.path.getmtime(path))
-    modified = modified.replace(tzinfo=timezone.utc)
+    modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
     return modified > date_update
 
 
@@ -208,6 +234,9 @@ def capture_map_image(url, destination, size=None, aspect=1.0, waitfor='.leaflet
     # Run head-less capture (takes time)
     url += '?lang={}&context={}'.format(get_language(), quote(serialized))
 
+    folder = os.path.dirname(destination)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
     with open(destination, 'wb') as fd:
         capture_image(url, fd,
                       selector='.map-panel',
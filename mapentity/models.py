@@ -1,5 +1,7 @@
 import math
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 
 from PIL import Image, ImageDraw, ImageFont
 from django.conf import settings
@@ -9,16 +11,20 @@ from django.contrib.admin.models import LogEntry as BaseLogEntry
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import FieldError, ObjectDoesNotExist
-from django.db import models
+from django.db import connections, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Cast
+from django.db.models.query import ModelIterable
 from django.db.utils import OperationalError
-from django.urls import reverse, NoReverseMatch
+from django.urls import reverse, NoReverseMatch, get_script_prefix, get_urlconf, set_script_prefix, set_urlconf
 from django.utils.formats import localize
+from django.utils import translation
 from django.utils.timezone import utc
 from django.utils.translation import gettext_lazy as _
 from rest_framework import permissions as rest_permissions
 
 from mapentity.templatetags.mapentity_tags import humanize_timesince
-from .helpers import smart_urljoin, is_file_uptodate, capture_map_image, extract_attributes_html
+from .helpers import smart_urljoin, is_file_uptodate, capture_map_image, extract_attributes_html, reverse_pk
 from .settings import app_settings, API_SRID
 
 # Used to create the matching url name
@@ -56,6 +62,25 @@ ENTITY_PERMISSIONS = (
     ENTITY_PERMISSION_EXPORT
 )
 
+ENTITY_KIND_PERMISSIONS = {
+    ENTITY_CREATE: ENTITY_PERMISSION_CREATE,
+    ENTITY_UPDATE: ENTITY_PERMISSION_UPDATE,
+    ENTITY_UPDATE_GEOM: ENTITY_PERMISSION_UPDATE_GEOM,
+    ENTITY_DELETE: ENTITY_PERMISSION_DELETE,
+    ENTITY_DETAIL: ENTITY_PERMISSION_READ,
+    ENTITY_LAYER: ENTITY_PERMISSION_READ,
+    ENTITY_LIST: ENTITY_PERMISSION_READ,
+    ENTITY_DATATABLE_LIST: ENTITY_PERMISSION_READ,
+    ENTITY_MARKUP: ENTITY_PERMISSION_READ,
+    ENTITY_FORMAT_LIST: ENTITY_PERMISSION_EXPORT,
+    ENTITY_MAPIMAGE: ENTITY_PERMISSION_EXPORT,
+    ENTITY_DOCUMENT: ENTITY_PERMISSION_EXPORT,
+}
+
+
+# In EPSG:3857 units (meters at equator)
+EARTH_CIRCUMFERENCE = 2 * math.pi * 6378137
+
 
 class MapEntityRestPermissions(rest_permissions.DjangoModelPermissions):
     perms_map = {
@@ -69,6 +94,92 @@ class MapEntityRestPermissions(rest_permissions.DjangoModelPermissions):
     }
 
 
+@lru_cache(maxsize=None)
+def _placeholder_font(size=24):
+    return ImageFont.truetype('/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf', size)
+
+
+@lru_cache(maxsize=None)
+def _placeholder_image(size):
+    """ Map image of objects without geometry, shared: copy it before any change """
+    image = Image.new('RGB', (size, size), color=(192, 192, 192))
+    draw = ImageDraw.Draw(image)
+    draw.text((10, 10), "This object has no geometry", font=_placeholder_font(), fill=(0, 0, 0))
+    return image
+
+
+@lru_cache(maxsize=None)
+def _get_permission_codename(model, entity_kind):
+    perm = model.get_entity_kind_permission(entity_kind)
+    opts = model._meta
+    appname = opts.app_label.lower()
+    if opts.proxy:
+        proxied = opts.proxy_for_model._meta
+        appname = proxied.app_label.lower() if proxied.app_label.lower() != "admin" else appname
+    return f'{appname}.{auth.get_permission_codename(perm, opts)}'
+
+
+def _prepare_map_image(obj, rooturl, language, script_prefix, urlconf):
+    # Language, script prefix and urlconf are thread-local: restore the caller's ones
+    previous_script_prefix, previous_urlconf = get_script_prefix(), get_urlconf()
+    set_script_prefix(script_prefix)
+    set_urlconf(urlconf)
+    try:
+        with translation.override(language):
+            return obj.prepare_map_image(rooturl)
+    finally:
+        set_script_prefix(previous_script_prefix)
+        set_urlconf(previous_urlconf)
+        # Database connections are opened per thread
+        connections.close_all()
+
+
+class MapEntityQuerySet(models.QuerySet):
+    """ Not installed by ``MapEntityMixin``, to keep models managers untouched.
+    Use ``MapEntityQuerySet.as_manager()``, or ``YourManager.from_queryset(MapEntityQuerySet)()``
+    to combine it with a custom manager.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._with_author_info = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_author_info = self._with_author_info
+        return clone
+
+    def _fetch_all(self):
+        fetch_authors = self._result_cache is None
+        super()._fetch_all()
+        if fetch_authors and self._with_author_info and self._iterable_class is ModelIterable:
+            self._fetch_authors()
+
+    def _fetch_authors(self):
+        """ Resolve annotated authors of all fetched objects with one query """
+        user_ids = {obj.creator_id for obj in self._result_cache} | {obj.last_author_id for obj in self._result_cache}
+        user_ids.discard(None)
+        users = auth.get_user_model()._default_manager.in_bulk(user_ids) if user_ids else {}
+        for obj in self._result_cache:
+            obj._creator = users.get(obj.creator_id)
+            obj._last_author = users.get(obj.last_author_id)
+
+    def with_author_info(self):
+        """ Annotate objects with ``creator_id`` and ``last_author_id``,
+        read from history in the same query, and fetch these users with
+        one more query when objects are fetched.
+        """
+        entries = LogEntry.objects.filter(
+            content_type_id=self.model.get_content_type_id(),
+            object_id=Cast(OuterRef('pk'), output_field=models.TextField())
+        ).order_by('-pk').values('user_id')
+        clone = self.annotate(
+            creator_id=Subquery(entries.filter(action_flag=ADDITION)[:1]),
+            last_author_id=Subquery(entries[:1]),
+        )
+        clone._with_author_info = True
+        return clone
+
+
 class BaseMapEntityMixin(models.Model):
     _entity = None
     capture_map_image_waitfor = '.leaflet-tile-loaded'
@@ -86,41 +197,22 @@ class BaseMapEntityMixin(models.Model):
 
     @classmethod
     def get_entity_kind_permission(cls, entity_kind):
-        operations = {
-            ENTITY_CREATE: ENTITY_PERMISSION_CREATE,
-            ENTITY_UPDATE: ENTITY_PERMISSION_UPDATE,
-            ENTITY_UPDATE_GEOM: ENTITY_PERMISSION_UPDATE_GEOM,
-            ENTITY_DELETE: ENTITY_PERMISSION_DELETE,
-            ENTITY_DETAIL: ENTITY_PERMISSION_READ,
-            ENTITY_LAYER: ENTITY_PERMISSION_READ,
-            ENTITY_LIST: ENTITY_PERMISSION_READ,
-            ENTITY_DATATABLE_LIST: ENTITY_PERMISSION_READ,
-            ENTITY_MARKUP: ENTITY_PERMISSION_READ,
-            ENTITY_FORMAT_LIST: ENTITY_PERMISSION_EXPORT,
-            ENTITY_MAPIMAGE: ENTITY_PERMISSION_EXPORT,
-            ENTITY_DOCUMENT: ENTITY_PERMISSION_EXPORT,
-        }
-        perm = operations.get(entity_kind, entity_kind)
+        perm = ENTITY_KIND_PERMISSIONS.get(entity_kind, entity_kind)
         assert perm in ENTITY_PERMISSIONS
         return perm
 
     @classmethod
     def get_permission_codename(cls, entity_kind):
-        perm = cls.get_entity_kind_permission(entity_kind)
-        opts = cls._meta
-        appname = opts.app_label.lower()
-        if opts.proxy:
-            proxied = opts.proxy_for_model._meta
-            appname = proxied.app_label.lower() if proxied.app_label.lower() != "admin" else appname
-        return '%s.%s' % (appname, auth.get_permission_codename(perm, opts))
+        return _get_permission_codename(cls, entity_kind)
 
     @classmethod
     def latest_updated(cls):
         try:
             fname = app_settings['DATE_UPDATE_FIELD_NAME']
-            return cls.objects.only(fname).latest(fname).get_date_update()
-        except (cls.DoesNotExist, FieldError):
+            latest = cls.objects.aggregate(latest=Max(fname))['latest']
+        except FieldError:
             return None
+        return latest and latest.replace(tzinfo=utc)
 
     def get_date_update(self):
         try:
@@ -136,14 +228,26 @@ class BaseMapEntityMixin(models.Model):
 
     def delete(self, *args, **kwargs):
         # Delete map image capture when delete object
-        image_path = self.get_map_image_path()
-        if os.path.exists(image_path):
-            os.unlink(image_path)
+        try:
+            os.unlink(self.get_map_image_path())
+        except FileNotFoundError:
+            pass
         super().delete(*args, **kwargs)
 
+    @classmethod
+    def _get_api_url(cls, extension):
+        # Cached in the class own namespace, so that subclasses do not share their parent's URLs
+        api_urls = cls.__dict__.get('_api_urls')
+        if api_urls is None:
+            api_urls = cls._api_urls = {}
+        if extension not in api_urls:
+            model_name = cls._meta.model_name.lower()
+            api_urls[extension] = f'/api/{model_name}/drf/{model_name}s.{extension}'
+        return api_urls[extension]
+
     @classmethod
     def get_layer_url(cls):
-        return '/api/' + cls._meta.model_name.lower() + '/drf/' + cls._meta.model_name.lower() + 's.geojson'
+        return cls._get_api_url('geojson')
 
     @classmethod
     def get_list_url(cls):
@@ -151,12 +255,11 @@ class BaseMapEntityMixin(models.Model):
 
     @classmethod
     def get_datatablelist_url(cls):
-        return '/api/' + cls._meta.model_name.lower() + '/drf/' + cls._meta.model_name.lower() + 's.datatables'
+        return cls._get_api_url('datatables')
 
     def get_layer_detail_url(self):
-        return reverse("{app_name}:{model_name}-drf-detail".format(app_name=self._meta.app_label.lower(),
-                                                                   model_name=self._meta.model_name.lower()),
-                       kwargs={"format": "geojson", "pk": self.pk})
+        opts = self._meta
+        return reverse_pk(f"{opts.app_label.lower()}:{opts.model_name.lower()}-drf-detail", self.pk, format="geojson")
 
     @classmethod
     def get_format_list_url(cls):
@@ -174,28 +277,30 @@ class BaseMapEntityMixin(models.Model):
         return reverse(cls._entity.url_name(ENTITY_DETAIL), args=[str(0)])
 
     def get_detail_url(self):
-        return reverse(self._entity.url_name(ENTITY_DETAIL), args=[str(self.pk)])
+        return reverse_pk(self._entity.url_name(ENTITY_DETAIL), self.pk)
 
     @property
     def map_image_url(self):
         return self.get_map_image_url()
 
     def get_map_image_url(self):
-        return reverse(self._entity.url_name(ENTITY_MAPIMAGE), args=[str(self.pk)])
+        return reverse_pk(self._entity.url_name(ENTITY_MAPIMAGE), self.pk)
 
     def get_document_url(self):
-        return reverse(self._entity.url_name(ENTITY_DOCUMENT), args=[str(self.pk)])
+        return reverse_pk(self._entity.url_name(ENTITY_DOCUMENT), self.pk)
 
     def get_update_url(self):
-        return reverse(self._entity.url_name(ENTITY_UPDATE), args=[str(self.pk)])
+        return reverse_pk(self._entity.url_name(ENTITY_UPDATE), self.pk)
 
     def get_delete_url(self):
-        return reverse(self._entity.url_name(ENTITY_DELETE), args=[str(self.pk)])
+        return reverse_pk(self._entity.url_name(ENTITY_DELETE), self.pk)
 
     def get_map_image_extent(self, srid=API_SRID):
         fieldname = app_settings['GEOM_FIELD_NAME']
         obj = getattr(self, fieldname)
-        obj.transform(srid)
+        if obj.srid != srid:
+            # Do not alter the object geometry
+            obj = obj.transform(srid, clone=True)
         return obj.extent
 
     def prepare_map_image(self, rooturl):
@@ -204,12 +309,8 @@ class BaseMapEntityMixin(models.Model):
         if is_file_uptodate(path, self.get_date_update()):
             return False
         if self.get_geom() is None:
-            size = app_settings['MAP_CAPTURE_SIZE']
-            image = Image.new('RGB', (size, size), color=(192, 192, 192))
-            font = ImageFont.truetype('/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf', 24)
-            draw = ImageDraw.Draw(image)
-            draw.text((10, 10), "This object has no geometry", font=font, fill=(0, 0, 0))
-            image.save(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _placeholder_image(app_settings['MAP_CAPTURE_SIZE']).save(path)
             return True
         url = smart_urljoin(rooturl, self.get_detail_url())
         extent = self.get_map_image_extent(3857)
@@ -217,34 +318,55 @@ class BaseMapEntityMixin(models.Model):
         if length:
             hint_size = app_settings['MAP_CAPTURE_SIZE']
             length_per_tile = 256 * length / hint_size
-            RADIUS = 6378137
-            CIRCUM = 2 * math.pi * RADIUS
-            zoom = round(math.log(CIRCUM / length_per_tile, 2))
-            size = math.ceil(length * 1.1 * 256 * 2 ** zoom / CIRCUM)
+            zoom = round(math.log2(EARTH_CIRCUMFERENCE / length_per_tile))
+            size = math.ceil(length * 1.1 * 256 * 2 ** zoom / EARTH_CIRCUMFERENCE)
         else:
             size = app_settings['MAP_CAPTURE_SIZE']
         printcontext = self.get_printcontext() if hasattr(self, 'get_printcontext') else None
         capture_map_image(url, path, size=size, waitfor=self.capture_map_image_waitfor, printcontext=printcontext)
         return True
 
+    @classmethod
+    def prepare_map_images(cls, queryset, rooturl, max_workers=4):
+        """ Prepare map images of all objects of queryset, capturing outdated
+        ones concurrently. Returns the number of captured images.
+        """
+        outdated = [obj for obj in queryset
+                    if not is_file_uptodate(obj.get_map_image_path(), obj.get_date_update())]
+        if not outdated:
+            return 0
+        prepare = partial(_prepare_map_image, rooturl=rooturl, language=translation.get_language(),
+                          script_prefix=get_script_prefix(), urlconf=get_urlconf())
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return sum(executor.map(prepare, outdated))
+
     def get_map_image_path(self):
-        basefolder = os.path.join(settings.MEDIA_ROOT, 'maps')
-        if not os.path.exists(basefolder):
-            os.makedirs(basefolder)
-        return os.path.join(basefolder, '%s-%s.png' % (self._meta.model_name, self.pk))
+        return os.path.join(settings.MEDIA_ROOT, 'maps', f'{self._meta.model_name}-{self.pk}.png')
 
     def get_attributes_html(self, request):
         return extract_attributes_html(self.get_detail_url(), request)
 
     @classmethod
     def get_content_type_id(cls):
+        # Content types are cached by their manager, which Django clears when they may change
         try:
             return ContentType.objects.get_for_model(cls).pk
         except OperationalError:  # table is not yet created
             return None
 
+    def _get_annotated_user(self, name):
+        # Resolved in bulk by MapEntityQuerySet, or fetched once here (e.g. with iterator())
+        cache_name = '_' + name
+        if cache_name not in self.__dict__:
+            user_id = getattr(self, name + '_id')
+            user = None if user_id is None else auth.get_user_model()._default_manager.get(pk=user_id)
+            setattr(self, cache_name, user)
+        return self.__dict__[cache_name]
+
     @property
     def creator(self):
+        if 'creator_id' in self.__dict__:  # From MapEntityQuerySet.with_author_info()
+            return self._get_annotated_user('creator')
         log_entry = LogEntry.objects.filter(
             content_type_id=self.get_content_type_id(),
             object_id=self.pk,
@@ -259,6 +381,8 @@ class BaseMapEntityMixin(models.Model):
 
     @property
     def last_author(self):
+        if 'last_author_id' in self.__dict__:  # From MapEntityQuerySet.with_author_info()
+            return self._get_annotated_user('last_author')
         return self.authors.order_by('logentry__pk').last()
 
     def is_public(self):
@@ -297,25 +421,29 @@ class LogEntry(BaseMapEntityMixin, BaseLogEntry):
         return '{0} ({1})'.format(localize(self.action_time),
                                   humanize_timesince(self.action_time))
 
+    def _get_edited_object(self):
+        # Edited objects may have been fetched in bulk (see ``prepare_object_displays``)
+        if not hasattr(self, '_edited_object'):
+            return self.get_edited_object()
+        if self._edited_object is None:
+            raise ObjectDoesNotExist
+        return self._edited_object
+
     @property
     def object_display(self):
         model_str = str(self.content_type)
         try:
-            obj = self.get_edited_object()
+            obj = self._get_edited_object()
             assert obj._entity, 'Unregistered model %s' % model_str
             obj_url = obj.get_detail_url()
         except (ObjectDoesNotExist, NoReverseMatch, AssertionError):
-            return '%s %s' % (model_str, self.object_repr)
+            return f'{model_str} {self.object_repr}'
         else:
-            return '<a data-pk="%s" href="%s" >%s %s</a>' % (
-                obj.pk, obj_url, model_str, self.object_repr)
+            return f'<a data-pk="{obj.pk}" href="{obj_url}" >{model_str} {self.object_repr}</a>'
 
     def get_date_update(self):
         return self.action_time
 
     @classmethod
     def latest_updated(cls):
-        try:
-            return cls.objects.only('action_time').latest('action_time').get_date_update()
-        except (cls.DoesNotExist, FieldError):
-            return None
+        return cls.objects.aggregate(latest=Max('action_time'))['latest']
@@ -49,6 +49,8 @@ class MapEntityOptions:
         # Can't do reverse right now, URL not setup yet
         self.url_list = '%s:%s_%s' % (self.app_label, self.modelname, 'list')
         self.url_add = '%s:%s_%s' % (self.app_label, self.modelname, 'add')
+        # URL names, looked up for every object URL
+        self._url_names = {}
 
     def scan_views(self):
         """
@@ -180,8 +182,12 @@ class MapEntityOptions:
         return '%s_%s' % (self.modelname, kind)
 
     def url_name(self, kind):
-        assert kind in mapentity_models.ENTITY_KINDS
-        return '%s:%s' % (self.app_label, self.url_shortname(kind))
+        try:
+            return self._url_names[kind]
+        except KeyError:
+            assert kind in mapentity_models.ENTITY_KINDS
+            url_name = self._url_names[kind] = '%s:%s' % (self.app_label, self.url_shortname(kind))
+            return url_name
 
 
 class Registry:
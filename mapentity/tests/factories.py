@@ -1,6 +1,7 @@
 import factory
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.contrib.gis.geos import Point
 from faker import Faker
 from faker.providers import geo
@@ -50,6 +51,23 @@ class UserFactory(factory.django.DjangoModelFactory):
         user.save()
         return user
 
+    @classmethod
+    def create_batch_fast(cls, size, password=None, **kwargs):
+        """ Create users sharing the same password, hashing it once and inserting all users at once.
+        Unlike ``create_batch()``, ``groups`` and ``permissions`` are not supported.
+        """
+        model = cls._meta.model
+        hashed = make_password(password)
+        users = cls.build_batch(size, **kwargs)
+        for user in users:
+            user.password = hashed
+        users = model.objects.bulk_create(users)
+        if any(user.pk is None for user in users):
+            # Primary keys are not returned by bulk inserts on every database backend
+            usernames = [user.get_username() for user in users]
+            users = list(model.objects.filter(**{model.USERNAME_FIELD + '__in': usernames}).order_by('pk'))
+        return users
+
 
 class SuperUserFactory(UserFactory):
     is_superuser = True
@@ -387,7 +387,7 @@ class MapEntityDetail(ModelViewMixin, DetailView):
         logentries = LogEntry.objects.filter(
             content_type_id=self.object.get_content_type_id(),
             object_id=self.object.pk
-        ).order_by('-id')
+        ).select_related('user').order_by('-id')
         context['activetab'] = self.request.GET.get('tab')
         context['empty_map_message'] = _("No map available for this object.")
         context['logentries'] = logentries[:logentries_max]
@@ -1,5 +1,8 @@
+from collections import defaultdict
+
 import django_filters
 from django import forms
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from rest_framework_gis import serializers as gis_serializers
 
@@ -11,6 +14,25 @@ from ..registry import registry
 from ..serializers import MapentityGeojsonModelSerializer
 
 
+def prepare_object_displays(entries):
+    """ Fetch edited objects of log entries with one query per content type,
+    instead of one query per entry in ``LogEntry.object_display``.
+    """
+    object_ids = defaultdict(set)
+    for entry in entries:
+        object_ids[entry.content_type_id].add(entry.object_id)
+    edited_objects = {}
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:
+            continue
+        for pk, obj in model._base_manager.in_bulk(ids).items():
+            edited_objects[(content_type_id, str(pk))] = obj
+    for entry in entries:
+        entry._edited_object = edited_objects.get((entry.content_type_id, entry.object_id))
+    return entries
+
+
 class LogEntryFilter(BaseMapEntityFilterSet):
     content_type = django_filters.NumberFilter(widget=forms.HiddenInput)
     object_id = django_filters.NumberFilter(widget=forms.HiddenInput)
@@ -20,6 +42,12 @@ class LogEntryFilter(BaseMapEntityFilterSet):
         fields = ('user', 'content_type', 'object_id')
 
 
+# Columns needed to render log entries, without loading whole related users
+LOGENTRY_LIST_FIELDS = ('action_time', 'action_flag', 'object_repr', 'object_id',
+                        'content_type', 'content_type__app_label', 'content_type__model',
+                        'user', 'user__username')
+
+
 class LogEntryList(MapEntityList):
     queryset = LogEntry.objects.order_by('-action_time')
     filterform = LogEntryFilter
@@ -27,7 +55,7 @@ class LogEntryList(MapEntityList):
     unorderable_columns = ('object', )
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('content_type', 'user').only(*LOGENTRY_LIST_FIELDS)
         return queryset.filter(content_type_id__in=registry.content_type_ids)
 
 
@@ -56,5 +84,13 @@ class LogEntryViewSet(MapEntityViewSet):
     geojson_serializer_class = LogEntryGeoJSONSerializer
 
     def get_queryset(self):
-        qs = self.model.objects.order_by('-action_time')
+        qs = self.model.objects.select_related('content_type', 'user').order_by('-action_time')
+        # change_message is serialized too, so it cannot be deferred here
+        qs = qs.only('change_message', *LOGENTRY_LIST_FIELDS)
         return qs.filter(content_type_id__in=registry.content_type_ids)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            prepare_object_displays(page)
+        return page
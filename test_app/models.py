@@ -3,7 +3,7 @@ from django.contrib.gis.geos import GEOSGeometry
 from django.utils.translation import gettext_lazy as _
 from paperclip.models import FileType as BaseFileType, Attachment as BaseAttachment, License as BaseLicense
 
-from mapentity.models import MapEntityMixin
+from mapentity.models import MapEntityMixin, MapEntityQuerySet
 
 
 class FileType(BaseFileType):
@@ -74,6 +74,8 @@ class DummyModel(MapEntityMixin, models.Model):
     date_update = models.DateTimeField(auto_now=True, db_index=True)
     public = models.BooleanField(default=False)
 
+    objects = MapEntityQuerySet.as_manager()
+
     def __str__(self):
         return "{} ({})".format(self.name, self.pk)
 
@@ -0,0 +1,18 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase
+
+from mapentity.tests.factories import UserFactory
+
+
+class UserFactoryTest(TestCase):
+    @mock.patch('mapentity.tests.factories.make_password', wraps=make_password)
+    def test_create_batch_fast(self, mock_make_password):
+        users = UserFactory.create_batch_fast(3, password='booh')
+        self.assertEqual(len(users), 3)
+        mock_make_password.assert_called_once_with('booh')
+        for user in users:
+            self.assertIsNotNone(user.pk)
+            user.refresh_from_db()
+            self.assertTrue(user.check_password('booh'))
@@ -1,13 +1,20 @@
 import os
+from datetime import timedelta
+from tempfile import TemporaryDirectory
 from unittest import mock
 
 from django.test import TestCase
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
 
 from mapentity.helpers import (
+    capture_map_image,
     capture_url,
     convertit_url,
     user_has_perm,
-    download_to_stream
+    download_to_stream,
+    is_file_uptodate,
+    reverse_pk,
 )
 from mapentity.registry import app_settings
 
@@ -92,3 +99,57 @@ class DownloadStreamTest(TestCase):
         get_mocked.return_value.content = "x"
         download_to_stream('http://google.com', open(os.devnull, 'w'), silent=True, headers={'Accept-language': 'fr'})
         get_mocked.assert_called_with('http://google.com', headers={'Accept-language': 'fr'})
+
+
+class ReversePkTest(TestCase):
+    def test_same_as_reverse(self):
+        for pk in (1, 42, 8675309):
+            self.assertEqual(reverse_pk('test_app:dummymodel_detail', pk),
+                             reverse('test_app:dummymodel_detail', args=[str(pk)]))
+
+    def test_extra_kwargs(self):
+        self.assertEqual(reverse_pk('test_app:dummymodel-drf-detail', 3, format='geojson'),
+                         reverse('test_app:dummymodel-drf-detail', kwargs={'pk': 3, 'format': 'geojson'}))
+
+    def test_invalid_pk(self):
+        with self.assertRaises(NoReverseMatch):
+            reverse_pk('test_app:dummymodel_detail', None)
+        with self.assertRaises(NoReverseMatch):
+            reverse_pk('test_app:dummymodel_detail', 'abc')
+
+
+class IsFileUptodateTest(TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'file.png')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_missing_file(self):
+        self.assertFalse(is_file_uptodate(self.path, timezone.now()))
+
+    def test_no_date_update(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'*')
+        self.assertFalse(is_file_uptodate(self.path, None))
+
+    def test_empty_file_is_removed(self):
+        open(self.path, 'wb').close()
+        self.assertFalse(is_file_uptodate(self.path, timezone.now() - timedelta(days=1)))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_uptodate(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'*')
+        self.assertTrue(is_file_uptodate(self.path, timezone.now() - timedelta(days=1)))
+        self.assertFalse(is_file_uptodate(self.path, timezone.now() + timedelta(days=1)))
+
+
+class CaptureMapImageTest(TestCase):
+    @mock.patch('mapentity.helpers.capture_image')
+    def test_creates_destination_folder(self, mock_capture_image):
+        with TemporaryDirectory() as directory:
+            destination = os.path.join(directory, 'maps', 'image.png')
+            capture_map_image('http://geotrek.fr', destination)
+            self.assertTrue(os.path.exists(destination))
@@ -1,11 +1,14 @@
 from django.contrib.admin.models import ADDITION, CHANGE, DELETION
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.http import HttpRequest
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from mapentity.models import LogEntry
 from mapentity.tests import SuperUserFactory
 from mapentity.views.generic import log_action
+from mapentity.views.logentry import prepare_object_displays
 from ..models import DummyModel
 
 User = get_user_model()
@@ -86,3 +89,85 @@ class TestCreator(TestCase):
         self.request.user = user2
         log_action(self.request, self.obj, ADDITION)
         self.assertEqual(self.obj.creator, user2)
+
+    def test_with_author_info(self):
+        log_action(self.request, self.obj, ADDITION)
+        user2 = SuperUserFactory()
+        self.request.user = user2
+        log_action(self.request, self.obj, CHANGE)
+        obj = DummyModel.objects.with_author_info().get(pk=self.obj.pk)
+        self.assertEqual(obj.creator_id, self.user.pk)
+        self.assertEqual(obj.last_author_id, user2.pk)
+        self.assertEqual(obj.creator, self.obj.creator)
+        self.assertEqual(obj.last_author, self.obj.last_author)
+
+    def test_with_author_info_fetches_authors_in_bulk(self):
+        user2 = SuperUserFactory()
+        for obj in [self.obj] + [DummyModel.objects.create() for i in range(2)]:
+            self.request.user = self.user
+            log_action(self.request, obj, ADDITION)
+            self.request.user = user2
+            log_action(self.request, obj, CHANGE)
+        with self.assertNumQueries(2):
+            objects = list(DummyModel.objects.with_author_info())
+            for obj in objects:
+                self.assertEqual(obj.creator, self.user)
+                self.assertEqual(obj.last_author, user2)
+                self.assertEqual(obj.creator, self.user)
+        self.assertEqual(len(objects), 3)
+
+    def test_with_author_info_no_history(self):
+        obj = DummyModel.objects.with_author_info().get(pk=self.obj.pk)
+        self.assertIsNone(obj.creator)
+        self.assertIsNone(obj.last_author)
+
+
+class TestObjectDisplay(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = SuperUserFactory()
+        cls.obj = DummyModel.objects.create()
+        cls.deleted = DummyModel.objects.create()
+        request = HttpRequest()
+        request.user = cls.user
+        log_action(request, cls.obj, ADDITION)
+        log_action(request, cls.deleted, ADDITION)
+        cls.deleted.delete()
+
+    def test_prepared_object_display(self):
+        expected = [entry.object_display for entry in LogEntry.objects.order_by('pk')]
+        entries = list(LogEntry.objects.select_related('content_type').order_by('pk'))
+        prepare_object_displays(entries)
+        with self.assertNumQueries(0):
+            self.assertEqual([entry.object_display for entry in entries], expected)
+        self.assertIn('href="/dummymodel/{}/"'.format(self.obj.pk), expected[0])
+        self.assertNotIn('href', expected[1])
+
+
+class TestLogEntryViewSet(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = SuperUserFactory()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.request = HttpRequest()
+        self.request.user = self.user
+
+    def get_datatables(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/logentry/drf/logentrys.datatables')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data'], len(context.captured_queries)
+
+    def test_queries_do_not_depend_on_number_of_entries(self):
+        log_action(self.request, DummyModel.objects.create(), ADDITION)
+        data, expected_queries = self.get_datatables()
+        self.assertEqual(len(data), 1)
+        for i in range(5):
+            log_action(self.request, DummyModel.objects.create(), ADDITION)
+        data, queries = self.get_datatables()
+        self.assertEqual(len(data), 6)
+        self.assertEqual(queries, expected_queries)
+        for row in data:
+            self.assertIn('href="/dummymodel/', row['object'])
@@ -0,0 +1,79 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import get_script_prefix, set_script_prefix
+from django.utils import translation
+
+from .factories import DummyModelFactory
+from ..models import DummyModel
+
+
+class PrepareMapImagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        DummyModelFactory.create_batch(3)
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.directory.name)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    def capture(self, url, path, **kwargs):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'*' * 100)
+
+    @mock.patch('mapentity.models.capture_map_image')
+    def test_prepare_map_images(self, mock_capture):
+        mock_capture.side_effect = self.capture
+        count = DummyModel.prepare_map_images(DummyModel.objects.all(), 'http://localhost/')
+        self.assertEqual(count, 3)
+        self.assertEqual(mock_capture.call_count, 3)
+
+    @mock.patch('mapentity.models.capture_map_image')
+    def test_prepare_map_images_skips_uptodate(self, mock_capture):
+        mock_capture.side_effect = self.capture
+        DummyModel.prepare_map_images(DummyModel.objects.all(), 'http://localhost/')
+        mock_capture.reset_mock()
+        count = DummyModel.prepare_map_images(DummyModel.objects.all(), 'http://localhost/')
+        self.assertEqual(count, 0)
+        mock_capture.assert_not_called()
+
+    @mock.patch('mapentity.helpers.capture_image')
+    def test_prepare_map_images_keeps_language(self, mock_capture_image):
+        with translation.override('fr'):
+            DummyModel.prepare_map_images(DummyModel.objects.all(), 'http://localhost/')
+        self.assertEqual(mock_capture_image.call_count, 3)
+        for call in mock_capture_image.call_args_list:
+            self.assertIn('lang=fr', call[0][0])
+
+    @mock.patch('mapentity.helpers.capture_image')
+    def test_prepare_map_images_keeps_script_prefix(self, mock_capture_image):
+        previous_script_prefix = get_script_prefix()
+        set_script_prefix('/prefix/')
+        try:
+            DummyModel.prepare_map_images(DummyModel.objects.all(), 'http://localhost/')
+        finally:
+            set_script_prefix(previous_script_prefix)
+        for call in mock_capture_image.call_args_list:
+            self.assertIn('/prefix/dummymodel/', call[0][0])
+
+
+class MapImageExtentTest(TestCase):
+    def test_extent_does_not_alter_geometry(self):
+        obj = DummyModelFactory.create(geom='SRID=4326;POINT(1 2)')
+        extent = obj.get_map_image_extent(3857)
+        self.assertNotAlmostEqual(extent[0], 1)
+        self.assertEqual(obj.geom.srid, 4326)
+        self.assertEqual(obj.geom.coords, (1, 2))
+
+    def test_extent_same_srid(self):
+        obj = DummyModelFactory.create(geom='SRID=4326;POINT(1 2)')
+        self.assertEqual(obj.get_map_image_extent(4326), (1, 2, 1, 2))
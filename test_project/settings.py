@@ -146,6 +146,11 @@ SRID = 4326
 COMPRESS_ENABLED = False
 TEST = True
 
+# Fast password hashing, for tests
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
 MAPENTITY_CONFIG = {
     'SENDFILE_HTTP_HEADER': 'X-Accel-Redirect',
 }